@@ -1,3 +1,4 @@
+import uuid
 import streamlit as st
 from datetime import date, timedelta
 from PIL import Image
@@ -20,8 +21,10 @@ try:
 except Exception as e:
     st.warning(f"Error loading logo: {e}")
 
-# Create an instance of the FinancialAgent
-agent = FinancialAgent(language="en")
+# Create an instance of the FinancialAgent, tagged with this browser session for fair LLM queuing
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+agent = FinancialAgent(language="en", session_id=st.session_state.session_id)
 
 # Initialize session state for storing analysis results and chart options
 if 'analyzed' not in st.session_state:
@@ -1,19 +1,21 @@
 # agent.py
-import requests
 from datetime import date, timedelta
-from src.config import TOGETHER_API_KEY, TOGETHER_API_URL, MODEL_NAME
+from src.config import TOGETHER_API_KEY, MODEL_NAME
+from src.ai.scheduler import get_scheduler, Priority
 from src.data.stock_data import get_stock_data
 from src.analysis.statistics import compute_statistics
 from src.utils.pdf_generator import generate_pdf_report
 from src.ai.ticker_conversion import get_ticker_from_company_name
 
 class FinancialAgent:
-    def __init__(self, language="he"):
+    def __init__(self, language="he", session_id="default"):
         self.language = language
+        self.session_id = session_id
 
-    def _get_ai_analysis(self, summary: str) -> str:
+    def _get_ai_analysis(self, summary: str, priority: Priority = Priority.BULK) -> str:
         """
         מתודה פרטית המבצעת ניתוח חכם של הנתונים באמצעות API של Together.
+        הבקשה עוברת דרך ה-scheduler המרכזי לפי עדיפות ומזהה הסשן.
         """
         if not TOGETHER_API_KEY:
             return "Error: TOGETHER_API_KEY not found in environment variables."
@@ -25,11 +27,6 @@ class FinancialAgent:
             system_prompt = "You are a smart financial advisor. Respond in English with a friendly and professional analysis."
             user_prompt = f"Here is a table (CSV) with stock statistics:\n\n{summary}\n\nPlease analyze it and explain the key metrics to the user."
     
-        headers = {
-            "Authorization": f"Bearer {TOGETHER_API_KEY}",
-            "Content-Type": "application/json",
-        }
-    
         payload = {
             "model": MODEL_NAME,
             "messages": [
@@ -41,8 +38,7 @@ class FinancialAgent:
         }
     
         try:
-            response = requests.post(TOGETHER_API_URL, headers=headers, json=payload)
-            response_json = response.json()
+            response_json = get_scheduler().submit(payload, priority=priority, session_id=self.session_id)
             if "choices" in response_json:
                 return response_json["choices"][0]["message"]["content"]
             elif "error" in response_json:
@@ -61,7 +57,7 @@ class FinancialAgent:
         tickers_list = []
         for entry in raw_entries:
             # תמיד לקרוא לפונקציה להמרת שם לטיקר, גם אם הקלט נראה כבר כטיקר.
-            converted = get_ticker_from_company_name(entry, language=self.language)
+            converted = get_ticker_from_company_name(entry, language=self.language, session_id=self.session_id)
             tickers_list.append(converted)
         return tickers_list
 
@@ -105,7 +101,7 @@ class FinancialAgent:
         מאפשר שיחה עם הסוכן לאחר ביצוע הניתוח.
         עונה על השאלה באמצעות _get_ai_analysis.
         """
-        return self._get_ai_analysis(prompt)
+        return self._get_ai_analysis(prompt, priority=Priority.INTERACTIVE)
         
 if __name__ == '__main__':
     # דוגמה לבדיקה במצב קונסול
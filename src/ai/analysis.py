@@ -1,13 +1,14 @@
-import requests
-from ..config import TOGETHER_API_KEY, TOGETHER_API_URL, MODEL_NAME
+from ..config import TOGETHER_API_KEY, MODEL_NAME
+from .scheduler import get_scheduler, Priority
 
-def get_ai_analysis(summary: str, language: str = "he") -> str:
+def get_ai_analysis(summary: str, language: str = "he", session_id: str = "default") -> str:
     """
     Get AI analysis of the financial data.
     
     Args:
         summary (str): Financial data summary in CSV format
         language (str): Language for the analysis ('he' for Hebrew, 'en' for English)
+        session_id (str): Identifier of the user session, used for fair queuing
         
     Returns:
         str: AI-generated analysis
@@ -24,11 +25,6 @@ def get_ai_analysis(summary: str, language: str = "he") -> str:
         user_prompt = f"Here is a table (CSV) with stock statistics:\n\n{summary}\n\nPlease analyze it and explain the key metrics to the user."
     
     # Prepare API request
-    headers = {
-        "Authorization": f"Bearer {TOGETHER_API_KEY}",
-        "Content-Type": "application/json",
-    }
-    
     payload = {
         "model": MODEL_NAME,
         "messages": [
@@ -40,8 +36,7 @@ def get_ai_analysis(summary: str, language: str = "he") -> str:
     }
     
     try:
-        response = requests.post(TOGETHER_API_URL, headers=headers, json=payload)
-        response_json = response.json()
+        response_json = get_scheduler().submit(payload, priority=Priority.BULK, session_id=session_id)
         
         if "choices" in response_json:
             return response_json["choices"][0]["message"]["content"]
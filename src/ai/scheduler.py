@@ -0,0 +1,413 @@
+# src/ai/scheduler.py
+import threading
+import time
+from collections import OrderedDict, deque
+from enum import IntEnum
+
+import requests
+
+from src.config import (
+    TOGETHER_API_KEY,
+    TOGETHER_API_URL,
+    LLM_TOKENS_PER_MINUTE,
+    LLM_REQUESTS_PER_MINUTE,
+    LLM_MAX_CONCURRENCY,
+    LLM_QUEUE_TIMEOUT,
+)
+
+WINDOW_SECONDS = 60.0
+DEFAULT_RETRY_AFTER = 1.0
+
+
+class Priority(IntEnum):
+    """
+    Priority classes for LLM requests. Lower values are dispatched first.
+    """
+    INTERACTIVE = 0  # chat turns and ticker resolution
+    BULK = 1         # long analyses
+
+
+class _Job:
+    def __init__(self, payload: dict, priority: Priority, session_id: str, tokens: int, enqueued_at: float, deadline):
+        self.payload = payload
+        self.priority = priority
+        self.session_id = session_id
+        self.tokens = tokens
+        self.enqueued_at = enqueued_at
+        self.deadline = deadline  # time.monotonic() value, or None for no limit
+        self.queued = True
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _RateLimited(Exception):
+    def __init__(self, retry_after: float):
+        super().__init__(f"Provider rate limit hit, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+def estimate_tokens(payload: dict) -> int:
+    """
+    Rough token estimate for a chat completion payload (about 4 characters
+    per token for the prompt, plus the requested completion budget).
+    """
+    prompt_chars = sum(len(m.get("content", "")) for m in payload.get("messages", []))
+    return prompt_chars // 4 + int(payload.get("max_tokens", 0))
+
+
+def _parse_retry_after(value) -> float:
+    try:
+        return max(float(value), 0.0)
+    except (TypeError, ValueError):
+        return DEFAULT_RETRY_AFTER
+
+
+class LLMScheduler:
+    """
+    Central scheduler for all LLM traffic.
+
+    Requests are dispatched in priority order (see Priority). To keep bulk work
+    from starving under steady interactive load, one lower-priority job is
+    dispatched after every max_priority_burst consecutive higher-priority ones.
+    Within a priority class, sessions are served round-robin so a single
+    session cannot monopolise the endpoint. Dispatch is throttled by a
+    requests-per-minute and a tokens-per-minute budget over a sliding 60 second
+    window, and paused for Retry-After seconds when the provider answers 429.
+
+    The endpoint URL and key are constructor arguments, so the scheduler can be
+    pointed at a local fake server in tests.
+    """
+
+    def __init__(
+        self,
+        api_url: str = TOGETHER_API_URL,
+        api_key: str = TOGETHER_API_KEY,
+        tokens_per_minute: int = LLM_TOKENS_PER_MINUTE,
+        requests_per_minute: int = LLM_REQUESTS_PER_MINUTE,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        queue_timeout: float = LLM_QUEUE_TIMEOUT,
+        max_priority_burst: int = 4,
+        request_timeout: float = 60.0,
+        clock=time.monotonic,
+    ):
+        for name, value in (
+            ("tokens_per_minute", tokens_per_minute),
+            ("requests_per_minute", requests_per_minute),
+            ("max_concurrency", max_concurrency),
+            ("max_priority_burst", max_priority_burst),
+        ):
+            if not isinstance(value, int) or value < 1:
+                raise ValueError(f"{name} must be an integer >= 1, got {value!r}")
+        if queue_timeout is not None and queue_timeout <= 0:
+            raise ValueError(f"queue_timeout must be positive or None, got {queue_timeout!r}")
+
+        self.api_url = api_url
+        self.api_key = api_key
+        self.tokens_per_minute = tokens_per_minute
+        self.requests_per_minute = requests_per_minute
+        self.max_concurrency = max_concurrency
+        self.queue_timeout = queue_timeout
+        self.max_priority_burst = max_priority_burst
+        self.request_timeout = request_timeout
+        self._clock = clock
+
+        self._cond = threading.Condition()
+        # priority -> OrderedDict(session_id -> deque of jobs); key order is the round-robin order
+        self._queues = {p: OrderedDict() for p in Priority}
+        # sliding window of dispatched requests: [timestamp, tokens]
+        self._window = deque()
+        self._workers = []
+        self._running = False
+        self._paused_until = 0.0
+        # consecutive dispatches from the top class while a lower class was waiting
+        self._priority_streak = 0
+
+        self._in_flight = 0
+        self._completed = 0
+        self._failed = 0
+        self._rate_limited = 0
+        self._timed_out = 0
+        self._wait_total = {p: 0.0 for p in Priority}
+        self._wait_max = {p: 0.0 for p in Priority}
+        self._dispatched = {p: 0 for p in Priority}
+
+    # ------------------------------------------------------------------ public
+
+    def submit(self, payload: dict, priority: Priority = Priority.BULK, session_id: str = "default", timeout=None) -> dict:
+        """
+        Queue a chat completion request and block until it has been sent.
+
+        Args:
+            payload (dict): JSON body for the chat completions endpoint
+            priority (Priority): Priority class of the request
+            session_id (str): Identifier of the user session, used for fair queuing
+            timeout (float): Maximum seconds to wait in the queue, defaults to queue_timeout
+
+        Returns:
+            dict: Parsed JSON response from the endpoint
+
+        Raises:
+            TimeoutError: If the request was not dispatched within timeout
+            Exception: Any error raised while contacting the endpoint
+        """
+        if timeout is None:
+            timeout = self.queue_timeout
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        job = _Job(payload, Priority(priority), session_id, estimate_tokens(payload), self._clock(), deadline)
+        with self._cond:
+            self._ensure_started()
+            self._queues[job.priority].setdefault(session_id, deque()).append(job)
+            self._cond.notify_all()
+
+        # Once past the deadline, a job that is in flight is polled until it
+        # finishes (bounded by request_timeout; a 429 past the deadline fails it
+        # instead of requeueing), while a queued one is removed.
+        while not job.done.wait(None if deadline is None else max(deadline - time.monotonic(), 0.1)):
+            with self._cond:
+                if job.queued:
+                    self._remove(job)
+                    self._timed_out += 1
+                    raise TimeoutError(f"LLM request waited more than {timeout}s in the queue")
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+    def metrics(self) -> dict:
+        """
+        Snapshot of scheduler state.
+
+        Returns:
+            dict: queue depth per priority, in-flight/completed/failed/rate-limited/
+                  timed-out counts, average and maximum queue wait (seconds) per
+                  priority, and current usage of the per-minute budgets
+        """
+        with self._cond:
+            now = self._clock()
+            self._expire_window(now)
+            return {
+                "queue_depth": {
+                    p.name.lower(): sum(len(q) for q in self._queues[p].values()) for p in Priority
+                },
+                "in_flight": self._in_flight,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rate_limited": self._rate_limited,
+                "timed_out": self._timed_out,
+                "avg_wait_seconds": {
+                    p.name.lower(): (self._wait_total[p] / self._dispatched[p]) if self._dispatched[p] else 0.0
+                    for p in Priority
+                },
+                "max_wait_seconds": {p.name.lower(): self._wait_max[p] for p in Priority},
+                "requests_last_minute": len(self._window),
+                "tokens_last_minute": sum(entry[1] for entry in self._window),
+                "paused_seconds": max(self._paused_until - now, 0.0),
+            }
+
+    def shutdown(self):
+        """
+        Stop the worker threads. Jobs still queued are failed.
+        """
+        with self._cond:
+            self._running = False
+            for sessions in self._queues.values():
+                for jobs in sessions.values():
+                    for job in jobs:
+                        job.queued = False
+                        job.error = RuntimeError("LLM scheduler shut down")
+                        job.done.set()
+                sessions.clear()
+            self._cond.notify_all()
+        for worker in self._workers:
+            worker.join()
+        self._workers = []
+
+    # ---------------------------------------------------------------- internal
+
+    def _ensure_started(self):
+        if self._running:
+            return
+        self._running = True
+        self._workers = [
+            threading.Thread(target=self._worker_loop, name=f"llm-scheduler-{i}", daemon=True)
+            for i in range(self.max_concurrency)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def _expire_window(self, now: float):
+        while self._window and now - self._window[0][0] >= WINDOW_SECONDS:
+            self._window.popleft()
+
+    def _peek_next(self):
+        """
+        Return the next job to dispatch: highest priority first (unless the
+        burst limit says a waiting lower class is due), then the session at the
+        front of that class's round-robin order.
+        """
+        ready = [p for p in Priority if self._queues[p]]
+        if not ready:
+            return None
+        p = ready[0]
+        if len(ready) > 1 and self._priority_streak >= self.max_priority_burst:
+            p = ready[1]
+        sessions = self._queues[p]
+        return sessions[next(iter(sessions))][0]
+
+    def _pop(self, job: _Job):
+        ready = [p for p in Priority if self._queues[p]]
+        if job.priority == ready[0] and len(ready) > 1:
+            self._priority_streak += 1
+        else:
+            self._priority_streak = 0
+
+        sessions = self._queues[job.priority]
+        jobs = sessions.pop(job.session_id)
+        jobs.popleft()
+        job.queued = False
+        if jobs:
+            # Re-append so the session goes to the back of the round-robin order
+            sessions[job.session_id] = jobs
+
+    def _remove(self, job: _Job):
+        sessions = self._queues[job.priority]
+        jobs = sessions[job.session_id]
+        jobs.remove(job)
+        if not jobs:
+            del sessions[job.session_id]
+        job.queued = False
+
+    def _requeue_front(self, job: _Job):
+        sessions = self._queues[job.priority]
+        sessions.setdefault(job.session_id, deque()).appendleft(job)
+        sessions.move_to_end(job.session_id, last=False)
+        job.queued = True
+
+    def _budget_delay(self, job: _Job, now: float) -> float:
+        """
+        Seconds until the budgets allow dispatching job (0 if it can go now).
+        A job larger than the whole token budget is allowed once the window is empty.
+        """
+        self._expire_window(now)
+        if not self._window:
+            return 0.0
+        used_tokens = sum(entry[1] for entry in self._window)
+        if len(self._window) < self.requests_per_minute and used_tokens + job.tokens <= self.tokens_per_minute:
+            return 0.0
+
+        # Find how many of the oldest entries must expire before the job fits
+        requests_left = len(self._window)
+        for ts, tokens in self._window:
+            requests_left -= 1
+            used_tokens -= tokens
+            if requests_left < self.requests_per_minute and (
+                used_tokens + job.tokens <= self.tokens_per_minute or requests_left == 0
+            ):
+                return max(ts + WINDOW_SECONDS - now, 0.0)
+        return 0.0
+
+    def _next_job(self):
+        """
+        Wait until a job may be dispatched and claim it. Returns None on shutdown.
+        Must be called with the condition held.
+        """
+        while self._running:
+            job = self._peek_next()
+            if job is None:
+                self._cond.wait()
+                continue
+            now = self._clock()
+            delay = max(self._paused_until - now, self._budget_delay(job, now))
+            if delay <= 0:
+                self._pop(job)
+                return job
+            self._cond.wait(timeout=delay)
+        return None
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                job = self._next_job()
+                if job is None:
+                    return
+                now = self._clock()
+                usage = [now, job.tokens]
+                self._window.append(usage)
+                wait = now - job.enqueued_at
+                self._dispatched[job.priority] += 1
+                self._wait_total[job.priority] += wait
+                self._wait_max[job.priority] = max(self._wait_max[job.priority], wait)
+                self._in_flight += 1
+
+            requeued = False
+            try:
+                job.result = self._send(job.payload)
+            except Exception as e:
+                job.error = e
+
+            try:
+                with self._cond:
+                    self._in_flight -= 1
+                    if isinstance(job.error, _RateLimited):
+                        self._rate_limited += 1
+                        # The provider rejected it, so it used no completion tokens
+                        usage[1] = 0
+                        self._paused_until = max(self._paused_until, self._clock() + job.error.retry_after)
+                        if self._running and (job.deadline is None or time.monotonic() < job.deadline):
+                            job.error = None
+                            self._requeue_front(job)
+                            requeued = True
+                        else:
+                            self._failed += 1
+                    elif job.error is None:
+                        self._completed += 1
+                        reported = self._reported_tokens(job.result)
+                        if reported is not None:
+                            # Replace the estimate with the provider-reported usage
+                            usage[1] = reported
+                    else:
+                        self._failed += 1
+            except Exception as e:
+                job.error = e
+            finally:
+                with self._cond:
+                    self._cond.notify_all()
+                if not requeued:
+                    job.done.set()
+
+    @staticmethod
+    def _reported_tokens(result):
+        if not isinstance(result, dict):
+            return None
+        usage = result.get("usage")
+        if not isinstance(usage, dict):
+            return None
+        total = usage.get("total_tokens")
+        if isinstance(total, bool) or not isinstance(total, (int, float)) or total < 0:
+            return None
+        return int(total)
+
+    def _send(self, payload: dict) -> dict:
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+        }
+        response = requests.post(self.api_url, headers=headers, json=payload, timeout=self.request_timeout)
+        if response.status_code == 429:
+            raise _RateLimited(_parse_retry_after(response.headers.get("Retry-After")))
+        return response.json()
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> LLMScheduler:
+    """
+    Return the process-wide scheduler shared by all sessions.
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = LLMScheduler()
+        return _scheduler
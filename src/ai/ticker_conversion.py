@@ -1,9 +1,9 @@
 # src/ai/ticker_conversion.py
-import requests
-from src.config import TOGETHER_API_KEY, TOGETHER_API_URL, MODEL_NAME
+from src.config import TOGETHER_API_KEY, MODEL_NAME
+from src.ai.scheduler import get_scheduler, Priority
 
 
-def get_ticker_from_company_name(company_name: str, language: str = "en") -> str:
+def get_ticker_from_company_name(company_name: str, language: str = "en", session_id: str = "default") -> str:
     """
     משתמש ב-LLM להמרת שם חברה לטיקר.
     אם אין מפתח API, מחזיר את שם החברה באותיות גדולות.
@@ -23,11 +23,6 @@ def get_ticker_from_company_name(company_name: str, language: str = "en") -> str
             "Return only the exact ticker without any additional text or explanation (e.g., 'AAPL')."
         )
     
-    headers = {
-        "Authorization": f"Bearer {TOGETHER_API_KEY}",
-        "Content-Type": "application/json",
-    }
-    
     payload = {
         "model": MODEL_NAME,
         "messages": [
@@ -38,8 +33,7 @@ def get_ticker_from_company_name(company_name: str, language: str = "en") -> str
     }
     
     try:
-        response = requests.post(TOGETHER_API_URL, headers=headers, json=payload)
-        response_json = response.json()
+        response_json = get_scheduler().submit(payload, priority=Priority.INTERACTIVE, session_id=session_id)
         # הדפסת הפלט לצורך דיבאגינג (ניתן להסיר בהמשך)
         print(response_json)
         if "choices" in response_json:
@@ -9,6 +9,23 @@ TOGETHER_API_KEY = os.getenv("TOGETHER_API_KEY")
 TOGETHER_API_URL = "https://api.together.xyz/v1/chat/completions"
 MODEL_NAME="meta-llama/Meta-Llama-3.1-8B-Instruct-Turbo"
 
+def _positive_int_env(name: str, default: int) -> int:
+    """
+    Read a positive integer from the environment, falling back to default
+    when the variable is missing, not an integer, or less than 1.
+    """
+    try:
+        value = int(os.getenv(name, default))
+    except ValueError:
+        return default
+    return value if value >= 1 else default
+
+# LLM scheduler budgets (shared across all sessions)
+LLM_TOKENS_PER_MINUTE = _positive_int_env("LLM_TOKENS_PER_MINUTE", 60000)
+LLM_REQUESTS_PER_MINUTE = _positive_int_env("LLM_REQUESTS_PER_MINUTE", 60)
+LLM_MAX_CONCURRENCY = _positive_int_env("LLM_MAX_CONCURRENCY", 4)
+LLM_QUEUE_TIMEOUT = _positive_int_env("LLM_QUEUE_TIMEOUT", 120)  # seconds a request may wait in the queue
+
 # UI Configuration
 BACKGROUND_IMAGE_URL = "https://images.unsplash.com/photo-1517816743773-6e0fd518b4a6?ixlib=rb-1.2.1&auto=format&fit=crop&w=1950&q=80"
 BACKGROUND_STYLE = """
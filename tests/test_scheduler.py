@@ -0,0 +1,241 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.ai.scheduler import LLMScheduler, Priority, _Job
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class FakeEndpoint:
+    """
+    Local chat completions endpoint. Records the "tag" of each request in
+    arrival order; a request tagged "blocker" is held until release() so the
+    tests can build up a queue behind it.
+    """
+
+    def __init__(self):
+        self.order = []
+        self.gate = threading.Event()
+        self.responses = {}  # tag -> list of (status, headers, body), the last one repeats
+        endpoint = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                tag = body.get("tag")
+                endpoint.order.append(tag)
+                if tag == "blocker":
+                    endpoint.gate.wait(5)
+                script = endpoint.responses.get(tag, [(200, {}, {"choices": [{"message": {"content": tag}}]})])
+                status, headers, reply = script.pop(0) if len(script) > 1 else script[0]
+                data = json.dumps(reply).encode()
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def release(self):
+        self.gate.set()
+
+
+@pytest.fixture
+def endpoint():
+    fake = FakeEndpoint()
+    yield fake
+    fake.release()
+    fake.server.shutdown()
+
+
+def make_scheduler(endpoint, **kwargs):
+    kwargs.setdefault("max_concurrency", 1)
+    kwargs.setdefault("queue_timeout", 5)
+    return LLMScheduler(api_url=endpoint.url, api_key="test", **kwargs)
+
+
+def submit_async(scheduler, tag, priority=Priority.BULK, session_id="default", results=None):
+    def run():
+        try:
+            value = scheduler.submit({"tag": tag, "messages": []}, priority=priority, session_id=session_id)
+        except Exception as e:
+            value = e
+        if results is not None:
+            results[tag] = value
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    return thread
+
+
+def wait_for_queue(scheduler, depth):
+    for _ in range(200):
+        queued = sum(scheduler.metrics()["queue_depth"].values())
+        if queued >= depth:
+            return
+        time.sleep(0.01)
+    raise AssertionError(f"queue never reached depth {depth}")
+
+
+def run_behind_blocker(scheduler, endpoint, jobs):
+    threads = [submit_async(scheduler, "blocker")]
+    while endpoint.order != ["blocker"]:
+        time.sleep(0.01)
+    for tag, priority, session_id in jobs:
+        threads.append(submit_async(scheduler, tag, priority, session_id))
+    wait_for_queue(scheduler, len(jobs))
+    endpoint.release()
+    for thread in threads:
+        thread.join(5)
+    return endpoint.order[1:]
+
+
+def test_interactive_dispatched_before_bulk(endpoint):
+    scheduler = make_scheduler(endpoint)
+    order = run_behind_blocker(scheduler, endpoint, [
+        ("bulk-1", Priority.BULK, "a"),
+        ("bulk-2", Priority.BULK, "b"),
+        ("chat", Priority.INTERACTIVE, "c"),
+    ])
+    scheduler.shutdown()
+    assert order[0] == "chat"
+    assert scheduler.metrics()["completed"] == 4
+
+
+def test_sessions_served_round_robin(endpoint):
+    scheduler = make_scheduler(endpoint)
+    order = run_behind_blocker(scheduler, endpoint, [
+        ("a-1", Priority.BULK, "a"),
+        ("a-2", Priority.BULK, "a"),
+        ("a-3", Priority.BULK, "a"),
+        ("b-1", Priority.BULK, "b"),
+        ("b-2", Priority.BULK, "b"),
+    ])
+    scheduler.shutdown()
+    assert order == ["a-1", "b-1", "a-2", "b-2", "a-3"]
+
+
+def test_bulk_not_starved_by_interactive(endpoint):
+    scheduler = make_scheduler(endpoint, max_priority_burst=2)
+    jobs = [("bulk", Priority.BULK, "a")] + [(f"chat-{i}", Priority.INTERACTIVE, "b") for i in range(4)]
+    order = run_behind_blocker(scheduler, endpoint, jobs)
+    scheduler.shutdown()
+    assert order.index("bulk") == 2
+
+
+def test_budget_delay():
+    clock = FakeClock()
+    scheduler = LLMScheduler(api_url="http://unused", tokens_per_minute=100, requests_per_minute=2, clock=clock)
+    job = _Job({}, Priority.BULK, "a", 30, clock.now, None)
+
+    assert scheduler._budget_delay(job, clock.now) == 0.0
+
+    scheduler._window.extend([[clock.now - 50, 10], [clock.now - 20, 10]])
+    # RPM exhausted: wait for the oldest entry to leave the window
+    assert scheduler._budget_delay(job, clock.now) == pytest.approx(10.0)
+
+    scheduler._window.clear()
+    scheduler._window.extend([[clock.now - 50, 60], [clock.now - 20, 30]])
+    scheduler.requests_per_minute = 10
+    # TPM: 90 used + 30 > 100, the 60-token entry must expire first
+    assert scheduler._budget_delay(job, clock.now) == pytest.approx(10.0)
+
+    big = _Job({}, Priority.BULK, "a", 500, clock.now, None)
+    # Larger than the whole budget: allowed once the window is empty
+    assert scheduler._budget_delay(big, clock.now) == pytest.approx(40.0)
+
+    # Entries older than the window are expired
+    assert scheduler._budget_delay(job, clock.now + 60) == 0.0
+
+
+def test_malformed_usage_does_not_kill_worker(endpoint):
+    endpoint.responses["bad-usage"] = [(200, {}, {"choices": [], "usage": "oops"})]
+    endpoint.responses["bad-total"] = [(200, {}, {"choices": [], "usage": {"total_tokens": "many"}})]
+    scheduler = make_scheduler(endpoint)
+
+    assert scheduler.submit({"tag": "bad-usage", "messages": []})["usage"] == "oops"
+    assert scheduler.submit({"tag": "bad-total", "messages": []})["choices"] == []
+    # The single worker is still alive
+    assert scheduler.submit({"tag": "ok", "messages": []})["choices"][0]["message"]["content"] == "ok"
+    assert scheduler.metrics()["completed"] == 3
+    scheduler.shutdown()
+
+
+def test_endpoint_error_is_raised_to_caller():
+    scheduler = LLMScheduler(api_url="http://127.0.0.1:1/", api_key="test", max_concurrency=1, queue_timeout=5)
+    with pytest.raises(Exception):
+        scheduler.submit({"messages": []})
+    assert scheduler.metrics()["failed"] == 1
+    scheduler.shutdown()
+
+
+def test_rate_limited_request_is_retried(endpoint):
+    endpoint.responses["limited"] = [
+        (429, {"Retry-After": "0.2"}, {"error": "rate limited"}),
+        (200, {}, {"choices": [{"message": {"content": "done"}}]}),
+    ]
+    scheduler = make_scheduler(endpoint)
+    start = time.monotonic()
+    result = scheduler.submit({"tag": "limited", "messages": [], "max_tokens": 50})
+    assert result["choices"][0]["message"]["content"] == "done"
+    assert time.monotonic() - start >= 0.2
+    metrics = scheduler.metrics()
+    assert metrics["rate_limited"] == 1
+    assert metrics["completed"] == 1
+    assert metrics["tokens_last_minute"] == 50
+    scheduler.shutdown()
+
+
+def test_queue_timeout_removes_job(endpoint):
+    scheduler = make_scheduler(endpoint)
+    blocker = submit_async(scheduler, "blocker")
+    while endpoint.order != ["blocker"]:
+        time.sleep(0.01)
+    with pytest.raises(TimeoutError):
+        scheduler.submit({"tag": "late", "messages": []}, timeout=0.2)
+    metrics = scheduler.metrics()
+    assert metrics["timed_out"] == 1
+    assert metrics["queue_depth"] == {"interactive": 0, "bulk": 0}
+    endpoint.release()
+    blocker.join(5)
+    scheduler.shutdown()
+    assert "late" not in endpoint.order
+
+
+def test_shutdown_fails_queued_jobs(endpoint):
+    scheduler = make_scheduler(endpoint)
+    results = {}
+    threads = [submit_async(scheduler, "blocker", results=results)]
+    while endpoint.order != ["blocker"]:
+        time.sleep(0.01)
+    threads.append(submit_async(scheduler, "queued", results=results))
+    wait_for_queue(scheduler, 1)
+    stopper = threading.Thread(target=scheduler.shutdown)
+    stopper.start()
+    threads[1].join(5)
+    endpoint.release()
+    stopper.join(5)
+    assert isinstance(results["queued"], RuntimeError)
+
+
+@pytest.mark.parametrize("name", ["tokens_per_minute", "requests_per_minute", "max_concurrency"])
+def test_invalid_budgets_rejected(name):
+    with pytest.raises(ValueError):
+        LLMScheduler(api_url="http://unused", **{name: 0})